@@ -17,14 +17,34 @@ from datetime import datetime
 import img2pdf
 import re
 import io
+import shutil
+import zipfile
 from PIL import Image
 
 # --- Backend Functions (Unchanged) ---
-def pptx_to_pdf(input_pptx, output_pdf, stop_event):
-    powerpoint = None
+def open_powerpoint():
+    powerpoint = comtypes.client.CreateObject("PowerPoint.Application")
+    powerpoint.Visible = 1
+    return powerpoint
+
+def close_powerpoint(powerpoint):
+    try:
+        powerpoint.Quit()
+    except:
+        for proc in psutil.process_iter(['name']):
+            if proc.info['name'].lower() == 'powerpnt.exe':
+                proc.terminate()
+                try:
+                    proc.wait(timeout=3)
+                except psutil.TimeoutExpired:
+                    proc.kill()
+
+def pptx_to_pdf(input_pptx, output_pdf, stop_event, powerpoint=None):
+    # Переданный экземпляр PowerPoint переиспользуется и закрывается вызывающим кодом
+    own_powerpoint = powerpoint is None
     try:
-        powerpoint = comtypes.client.CreateObject("PowerPoint.Application")
-        powerpoint.Visible = 1
+        if own_powerpoint:
+            powerpoint = open_powerpoint()
         deck = powerpoint.Presentations.Open(input_pptx)
         if stop_event.is_set():
             deck.Close()
@@ -39,25 +59,19 @@ def pptx_to_pdf(input_pptx, output_pdf, stop_event):
         
         a4inpt = (img2pdf.mm_to_pt(297), img2pdf.mm_to_pt(210))
         layout = img2pdf.get_layout_fun(a4inpt)
-        with open(output_pdf, "wb") as f:
-            f.write(img2pdf.convert(temp_jpg, layout_fun=layout))
+        pdf_data = img2pdf.convert(temp_jpg, layout_fun=layout)
+        # output_pdf — путь к файлу или функция, открывающая поток для записи (например, в ZIP-архив);
+        # открываем его только с готовым PDF, чтобы ошибка конвертации не оставила пустой файл
+        with (output_pdf() if callable(output_pdf) else open(output_pdf, "wb")) as f:
+            f.write(pdf_data)
         
         os.remove(temp_jpg)
         return True
     except Exception as e:
         raise Exception(f"Ошибка конвертации: {e}")
     finally:
-        if powerpoint:
-            try:
-                powerpoint.Quit()
-            except:
-                for proc in psutil.process_iter(['name']):
-                    if proc.info['name'].lower() == 'powerpnt.exe':
-                        proc.terminate()
-                        try:
-                            proc.wait(timeout=3)
-                        except psutil.TimeoutExpired:
-                            proc.kill()
+        if own_powerpoint and powerpoint:
+            close_powerpoint(powerpoint)
 
 def replace_text(shape, placeholder, value, font_settings=None):
     if shape.has_text_frame:
@@ -112,109 +126,396 @@ def replace_text(shape, placeholder, value, font_settings=None):
             text_frame.auto_size = None
             text_frame.word_wrap = True
 
-def generate_diplomas(excel_path, ppt_template, output_dir, column_mapping, error_handling, default_values, font_settings, sort_column, enable_sorting, log_queue, progress_queue, eta_queue, stop_event):
-    wb = load_workbook(excel_path)
-    ws = wb.active
+def format_eta(seconds):
+    seconds = max(int(seconds), 0)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+class ProgressTracker:
+    # Доля каждого этапа в обработке одной записи: чтение строки, заполнение шаблона, запись PDF
+    STAGE_WEIGHTS = {"parse": 0.05, "render": 0.15, "write": 0.8}
+
+    def __init__(self, progress_queue, eta_queue, stop_event=None, interval=0.5, alpha=0.3):
+        self.progress_queue = progress_queue
+        self.eta_queue = eta_queue
+        self.stop_event = stop_event
+        self.interval = interval      # минимальный период между обновлениями GUI, сек
+        self.alpha = alpha            # вес нового измерения скорости
+        self.lock = threading.Lock()
+        self.total = 0
+        self.stages = {}
+        self.done_work = 0.0
+        self.rate = None
+        self.sample_time = None
+        self.sample_work = 0.0
+        self.last_emit = 0.0
+        self.flush_timer = None
+        self.finished = False
+
+    def add(self, count=1):
+        with self.lock:
+            self.total += count
+
+    def advance(self, key, *stages):
+        # Записи могут завершаться в любом порядке: учитываем этапы по ключу записи
+        with self.lock:
+            done = self.stages.setdefault(key, set())
+            for stage in stages:
+                if stage not in done:
+                    done.add(stage)
+                    self.done_work += self.STAGE_WEIGHTS[stage]
+            if "write" in stages:
+                self.sample(time.time())
+        self.emit()
+
+    def discard(self, key):
+        # Пропущенная запись убирается из общего объёма работы
+        with self.lock:
+            removed = sum(self.STAGE_WEIGHTS[stage] for stage in self.stages.pop(key, ()))
+            self.done_work -= removed
+            self.sample_work -= removed
+            self.total -= 1
+        self.emit()
+
+    def sample(self, now):
+        # Первая записанная запись включает разогрев PowerPoint: с неё только начинаем отсчёт
+        if self.sample_time is None:
+            self.sample_time, self.sample_work = now, self.done_work
+            return
+        elapsed = now - self.sample_time
+        if elapsed <= 0 or elapsed < self.interval:
+            # Почти одновременные завершения (параллельные записи, дубликаты) объединяем в одно измерение
+            return
+        current = (self.done_work - self.sample_work) / elapsed
+        self.rate = current if self.rate is None else self.rate + self.alpha * (current - self.rate)
+        self.sample_time, self.sample_work = now, self.done_work
+
+    def emit(self):
+        with self.lock:
+            if self.finished:
+                return
+            now = time.time()
+            wait = self.last_emit + self.interval - now
+            if wait > 0:
+                # Слишком частое обновление не теряем: последнее состояние уйдёт по истечении интервала
+                if self.flush_timer is None:
+                    self.flush_timer = threading.Timer(wait, self.flush)
+                    self.flush_timer.daemon = True
+                    self.flush_timer.start()
+                return
+            self.last_emit = now
+            percent = min(self.done_work / self.total * 100, 100) if self.total else 0
+            remaining = max(self.total - self.done_work, 0)
+            eta = remaining / self.rate if self.rate else None
+        self.progress_queue.put(percent)
+        if eta is not None:
+            self.eta_queue.put(format_eta(eta))
+
+    def flush(self):
+        with self.lock:
+            self.flush_timer = None
+        if self.stop_event is None or not self.stop_event.is_set():
+            self.emit()
+
+    def close(self):
+        # После завершения или ошибки запоздалые обновления в GUI не отправляем
+        with self.lock:
+            self.finished = True
+            if self.flush_timer:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+
+    def finish(self):
+        self.close()
+        self.progress_queue.put(100)
+        self.eta_queue.put(format_eta(0))
+
+def numbered_path(path, used_paths):
+    base, ext = os.path.splitext(path)
+    number = 2
+    while os.path.normcase(f"{base} ({number}){ext}") in used_paths:
+        number += 1
+    return f"{base} ({number}){ext}"
+
+def link_or_copy(source, target, duplicate_mode):
+    if os.path.exists(target):
+        os.remove(target)
+    if duplicate_mode == "link":
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            # Другой диск или ФС без жёстких ссылок — копируем
+            pass
+    shutil.copyfile(source, target)
+
+class FolderOutput:
+    can_overwrite = True
+
+    def __init__(self, output_dir, duplicate_mode):
+        self.output_dir = output_dir
+        self.duplicate_mode = duplicate_mode
+
+    def open(self, pdf_path):
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+        # Старый файл может быть жёсткой ссылкой на другой диплом — не пишем поверх общего содержимого
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+        return open(pdf_path, "wb")
+
+    def duplicate(self, source_pdf, pdf_path):
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+        link_or_copy(source_pdf, pdf_path, self.duplicate_mode)
+
+    def close(self):
+        pass
+
+class ZipOutput:
+    # Записи в ZIP не перезаписываются, поэтому совпадающие имена всегда нумеруются
+    can_overwrite = False
+
+    def __init__(self, output_dir, per_folder, store_only):
+        self.output_dir = output_dir
+        self.per_folder = per_folder
+        self.compression = zipfile.ZIP_STORED if store_only else zipfile.ZIP_DEFLATED
+        self.archives = {}
+
+    def locate(self, pdf_path):
+        relative = os.path.relpath(pdf_path, self.output_dir)
+        folder, name = os.path.split(relative)
+        if self.per_folder and folder:
+            archive_path = os.path.join(self.output_dir, folder + ".zip")
+        else:
+            archive_path, name = os.path.join(self.output_dir, "Дипломы.zip"), relative
+        if archive_path not in self.archives:
+            os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+            self.archives[archive_path] = zipfile.ZipFile(archive_path, "w", self.compression)
+        return self.archives[archive_path], name.replace(os.sep, "/")
+
+    def open(self, pdf_path):
+        archive, name = self.locate(pdf_path)
+        return archive.open(name, "w")
+
+    def duplicate(self, source_pdf, pdf_path):
+        source_archive, source_name = self.locate(source_pdf)
+        archive, name = self.locate(pdf_path)
+        archive.writestr(name, source_archive.read(source_name))
+
+    def close(self):
+        for archive in self.archives.values():
+            archive.close()
+        self.archives = {}
+
+def book_names(excel_paths):
+    # Одноимённые книги из разных папок различаем по имени папки, а при полном совпадении — по номеру
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in excel_paths]
+    names = []
+    for path, stem in zip(excel_paths, stems):
+        name = stem
+        if stems.count(stem) > 1:
+            name = f"{os.path.basename(os.path.dirname(os.path.abspath(path)))} - {stem}"
+        unique_name, number = name, 2
+        while unique_name in names:
+            unique_name = f"{name} ({number})"
+            number += 1
+        names.append(unique_name)
+    return names
+
+def load_sources(excel_paths, all_sheets):
+    sources = []
+    for path, book in zip(excel_paths, book_names(excel_paths)):
+        wb = load_workbook(path)
+        sheets = wb.worksheets if all_sheets else [wb.active]
+        stem = os.path.splitext(os.path.basename(path))[0]
+        folder = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        for ws in sheets:
+            # Подпапка зависит от набора источников: книга и/или лист, если их несколько.
+            # Ключи source_mappings от выбора не зависят: сначала «папка - книга - лист»
+            # (различает одноимённые книги), затем «книга - лист»
+            parts = []
+            if len(excel_paths) > 1:
+                parts.append(book)
+            if len(sheets) > 1:
+                parts.append(ws.title)
+            mapping_keys = [f"{folder} - {stem} - {ws.title}", f"{stem} - {ws.title}"]
+            sources.append((" - ".join(parts), f"{book} - {ws.title}", mapping_keys, ws))
+    return sources
+
+def sheet_headers(ws):
+    return [cell.value or f"Столбец {chr(65+i)}" for i, cell in enumerate(ws[1])]
+
+def match_sources(sources, column_mapping, source_mappings, skipped_sources):
+    # Пустые листы и листы без нужных столбцов (инструкции, справочники) пропускаем, а не прерываем пакет
+    matched = []
+    for label, source_id, mapping_keys, ws in sources:
+        mapping = next((source_mappings[key] for key in mapping_keys if key in (source_mappings or {})), column_mapping)
+        if ws.max_row < 2:
+            skipped_sources.append(f"{source_id}: пустой лист")
+            continue
+        headers = sheet_headers(ws)
+        missing = [col_name for col_name in mapping.values() if col_name not in headers and len(col_name) != 1]
+        if missing:
+            skipped_sources.append(f"{source_id}: нет столбцов {', '.join(missing)}")
+            continue
+        matched.append((label, ws, mapping, headers))
+    return matched
+
+def generate_diplomas(excel_path, ppt_template, output_dir, column_mapping, error_handling, default_values, font_settings, sort_column, enable_sorting, log_queue, progress_queue, eta_queue, stop_event, duplicate_mode="link", collision_policy="number", all_sheets=False, source_mappings=None, archive_mode="", archive_store=False):
+    excel_paths = [excel_path] if isinstance(excel_path, str) else list(excel_path)
+    skipped_sources = []
+    sources = match_sources(load_sources(excel_paths, all_sheets), column_mapping, source_mappings, skipped_sources)
+    if skipped_sources:
+        log_queue.put(f"Пропущены листы: {len(skipped_sources)}. Подробности: {'; '.join(skipped_sources)}")
+    if not sources:
+        log_queue.put("Ошибка: нет листов с сопоставленными столбцами")
+        return False
     participants = []
     skipped_rows = []
     
-    headers = [cell.value or f"Столбец {chr(65+i)}" for i, cell in enumerate(ws[1])]
-    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-        if stop_event.is_set():
-            log_queue.put("Генерация прервана")
-            return False
-        participant = {}
-        valid = True
-        for placeholder, col_name in column_mapping.items():
-            col_idx = headers.index(col_name) if col_name in headers else ord(col_name) - ord('A')
-            value = row[col_idx]
-            if value is None:
-                if error_handling == "skip":
-                    skipped_rows.append(f"Строка {row_idx}: пустое поле {placeholder} ({col_name})")
-                    valid = False
-                    break
-                elif error_handling == "default":
-                    value = default_values.get(placeholder, "Не указано")
-                else:
-                    log_queue.put(f"Ошибка: пустое поле {placeholder} ({col_name}) в строке {row_idx}")
+    tracker = ProgressTracker(progress_queue, eta_queue, stop_event)
+    try:
+        for label, ws, mapping, headers in sources:
+            tracker.add(ws.max_row - 1)
+    
+        for source_idx, (label, ws, mapping, headers) in enumerate(sources):
+            where = f" ({label})" if label else ""
+            source_dir = os.path.join(output_dir, re.sub(r'[\\/*?:"<>|]', "_", label)) if label else output_dir
+            for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+                if stop_event.is_set():
+                    log_queue.put("Генерация прервана")
                     return False
-            if placeholder == "DATE" and isinstance(value, datetime):
-                value = value.strftime("%d.%m.%Y")
-            elif placeholder == "DATE" and isinstance(value, str):
-                for fmt in ["%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%Y/%m/%d"]:
-                    try:
-                        value = datetime.strptime(value, fmt).strftime("%d.%m.%Y")
-                        break
-                    except ValueError:
-                        pass
-            participant[placeholder] = str(value)
-        if valid:
-            participants.append(participant)
-    
-    if skipped_rows:
-        log_queue.put(f"Пропущены строки: {len(skipped_rows)}. Подробности: {'; '.join(skipped_rows)}")
-    
-    os.makedirs(output_dir, exist_ok=True)
-    
-    total = len(participants)
-    processing_times = []
-    for idx, participant in enumerate(participants, 1):
-        if stop_event.is_set():
-            log_queue.put("Генерация прервана")
-            return False
-        start_time = time.time()
-        prs = Presentation(ppt_template)
-        slide = prs.slides[0]
-        
-        for shape in slide.shapes:
-            for placeholder in participant:
-                replace_text(shape, "{" + placeholder + "}", participant[placeholder], font_settings)
-        
-        safe_name = re.sub(r'[\\/*?:"<>|]', "_", participant.get("NAME", "unknown"))
-        pdf_name = f"{safe_name}.pdf"
-        
-        if enable_sorting and sort_column:
-            safe_sort_value = re.sub(r'[\\/*?:"<>|]', "_", participant.get(sort_column, "unknown"))
-            subdir = os.path.join(output_dir, safe_sort_value)
-            os.makedirs(subdir, exist_ok=True)
-            pdf_path = os.path.join(subdir, pdf_name)
+                key = (source_idx, row_idx)
+                participant = {}
+                valid = True
+                for placeholder, col_name in mapping.items():
+                    col_idx = headers.index(col_name) if col_name in headers else ord(col_name) - ord('A')
+                    value = row[col_idx]
+                    if value is None:
+                        if error_handling == "skip":
+                            skipped_rows.append(f"Строка {row_idx}{where}: пустое поле {placeholder} ({col_name})")
+                            valid = False
+                            break
+                        elif error_handling == "default":
+                            value = default_values.get(placeholder, "Не указано")
+                        else:
+                            log_queue.put(f"Ошибка: пустое поле {placeholder} ({col_name}) в строке {row_idx}{where}")
+                            return False
+                    if placeholder == "DATE" and isinstance(value, datetime):
+                        value = value.strftime("%d.%m.%Y")
+                    elif placeholder == "DATE" and isinstance(value, str):
+                        for fmt in ["%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%Y/%m/%d"]:
+                            try:
+                                value = datetime.strptime(value, fmt).strftime("%d.%m.%Y")
+                                break
+                            except ValueError:
+                                pass
+                    participant[placeholder] = str(value)
+                if valid:
+                    participants.append((key, f"Строка {row_idx}{where}", source_dir, participant))
+                    tracker.advance(key, "parse")
+                else:
+                    tracker.discard(key)
+    
+        if skipped_rows:
+            log_queue.put(f"Пропущены строки: {len(skipped_rows)}. Подробности: {'; '.join(skipped_rows)}")
+    
+        os.makedirs(output_dir, exist_ok=True)
+    
+        # Шаблон читаем один раз на весь пакет, PowerPoint запускаем один раз на все источники
+        with open(ppt_template, "rb") as f:
+            template_data = f.read()
+        if archive_mode:
+            output = ZipOutput(output_dir, archive_mode == "per_folder", archive_store)
         else:
-            pdf_path = os.path.join(output_dir, pdf_name)
-        
-        temp_pptx = os.path.abspath(f"temp_{safe_name}.pptx")
-        prs.save(temp_pptx)
+            output = FolderOutput(output_dir, duplicate_mode)
+        powerpoint = None
+        rendered = {}
+        rendered_paths = {}
+        used_paths = set()
         try:
-            if not pptx_to_pdf(temp_pptx, pdf_path, stop_event):
-                return False
-            log_queue.put(f"Сгенерирован диплом: {pdf_name}")
-        except Exception as e:
-            log_queue.put(str(e))
-            return False
+            for key, row_name, source_dir, participant in participants:
+                if stop_event.is_set():
+                    log_queue.put("Генерация прервана")
+                    return False
+                safe_name = re.sub(r'[\\/*?:"<>|]', "_", participant.get("NAME", "unknown"))
+                pdf_name = f"{safe_name}.pdf"
+            
+                if enable_sorting and sort_column:
+                    safe_sort_value = re.sub(r'[\\/*?:"<>|]', "_", participant.get(sort_column, "unknown"))
+                    subdir = os.path.join(source_dir, safe_sort_value)
+                else:
+                    subdir = source_dir
+                pdf_path = os.path.join(subdir, pdf_name)
+            
+                if os.path.normcase(pdf_path) in used_paths:
+                    if collision_policy == "skip":
+                        log_queue.put(f"{row_name}: файл {pdf_name} уже создан, пропущено")
+                        tracker.advance(key, "render", "write")
+                        continue
+                    elif collision_policy == "number" or not output.can_overwrite:
+                        pdf_path = numbered_path(pdf_path, used_paths)
+                        pdf_name = os.path.basename(pdf_path)
+                used_paths.add(os.path.normcase(pdf_path))
+            
+                # Одинаковые наборы значений рендерим один раз, дубликаты ссылаются на готовый PDF
+                content_key = tuple(sorted(participant.items()))
+                if content_key in rendered:
+                    source_pdf = rendered[content_key]
+                    if os.path.normcase(source_pdf) != os.path.normcase(pdf_path):
+                        output.duplicate(source_pdf, pdf_path)
+                        if rendered_paths.get(os.path.normcase(pdf_path)) not in (None, content_key):
+                            rendered.pop(rendered_paths.pop(os.path.normcase(pdf_path)))
+                    log_queue.put(f"{row_name}: дубликат, {pdf_name}")
+                    tracker.advance(key, "render", "write")
+                    continue
+            
+                prs = Presentation(io.BytesIO(template_data))
+                slide = prs.slides[0]
+            
+                for shape in slide.shapes:
+                    for placeholder in participant:
+                        replace_text(shape, "{" + placeholder + "}", participant[placeholder], font_settings)
+            
+                temp_pptx = os.path.abspath(f"temp_{safe_name}.pptx")
+                prs.save(temp_pptx)
+                tracker.advance(key, "render")
+                try:
+                    if powerpoint is None:
+                        powerpoint = open_powerpoint()
+                    if not pptx_to_pdf(temp_pptx, lambda: output.open(pdf_path), stop_event, powerpoint):
+                        return False
+                    log_queue.put(f"Сгенерирован диплом: {pdf_name}")
+                except Exception as e:
+                    log_queue.put(str(e))
+                    return False
+                finally:
+                    os.remove(temp_pptx) if os.path.exists(temp_pptx) else None
+                # При перезаписи прежнее содержимое файла больше не годится как источник дубликатов
+                rendered.pop(rendered_paths.get(os.path.normcase(pdf_path)), None)
+                rendered[content_key] = pdf_path
+                rendered_paths[os.path.normcase(pdf_path)] = content_key
+                tracker.advance(key, "write")
         finally:
-            os.remove(temp_pptx) if os.path.exists(temp_pptx) else None
-        processing_time = time.time() - start_time
-        processing_times.append(processing_time)
-        
-        progress_queue.put(idx / total * 100)
-        if processing_times:
-            avg_time = sum(processing_times) / len(processing_times)
-            remaining_records = total - idx
-            eta_seconds = int(avg_time * remaining_records)
-            eta_str = f"{eta_seconds // 60:02d}:{eta_seconds % 60:02d}"
-            eta_queue.put(eta_str)
-    
-    log_queue.put(f"Дипломы сохранены в: {output_dir}")
-    eta_queue.put("00:00")
-    return True
+            output.close()
+            if powerpoint:
+                close_powerpoint(powerpoint)
+    
+        log_queue.put(f"Дипломы сохранены в: {output_dir}")
+        tracker.finish()
+        return True
+    finally:
+        tracker.close()
 
 # --- GUI Application (wxPython, Updated UI) ---
 class DiplomaGeneratorApp(wx.Frame):
     def __init__(self):
-        super().__init__(None, title="Генератор дипломов", size=(1000, 400))
-        self.SetMinSize((1000, 400))
-        self.SetMaxSize((1000, 400))
+        super().__init__(None, title="Генератор дипломов", size=(1000, 450))
+        self.SetMinSize((1000, 450))
+        self.SetMaxSize((1000, 450))
         
         self.excel_path = ""
+        self.excel_paths = []
+        self.all_sheets = False
+        self.source_mappings = {}
         self.pptx_path = ""
         self.output_dir = ""
         self.column_mapping = {}
@@ -224,6 +525,10 @@ class DiplomaGeneratorApp(wx.Frame):
         self.font_settings = {"use_custom": False}
         self.sort_column = ""
         self.enable_sorting = True
+        self.duplicate_mode = "link"
+        self.collision_policy = "number"
+        self.archive_mode = ""
+        self.archive_store = False
         self.stop_event = threading.Event()
         self.log_queue = queue.Queue()
         self.progress_queue = queue.Queue()
@@ -335,6 +640,49 @@ class DiplomaGeneratorApp(wx.Frame):
         left_sizer.Add(self.sort_check, pos=(4, 1))
         left_sizer.Add(self.sort_choice, pos=(4, 2))
         
+        # Duplicates and file name collisions
+        duplicate_label = wx.StaticText(left_panel, label="Дубликаты:")
+        duplicate_label.SetFont(self.label_font)
+        self.duplicate_choice = wx.Choice(left_panel, choices=["Жёсткая ссылка", "Копия"])
+        self.duplicate_choice.SetSelection(0)
+        self.duplicate_choice.SetToolTip("Как сохранять дипломы для одинаковых записей")
+        self.duplicate_choice.Bind(wx.EVT_CHOICE, self.update_duplicates)
+        self.collision_choice = wx.Choice(left_panel, choices=["Нумеровать", "Пропустить", "Перезаписать"])
+        self.collision_choice.SetSelection(0)
+        self.collision_choice.SetToolTip("Что делать, если файл с таким именем уже создан")
+        self.collision_choice.Bind(wx.EVT_CHOICE, self.update_duplicates)
+        
+        left_sizer.Add(duplicate_label, pos=(5, 0), flag=wx.ALIGN_CENTER_VERTICAL)
+        left_sizer.Add(self.duplicate_choice, pos=(5, 1))
+        left_sizer.Add(self.collision_choice, pos=(5, 2))
+        
+        # Batch sources
+        sources_label = wx.StaticText(left_panel, label="Источники:")
+        sources_label.SetFont(self.label_font)
+        self.all_sheets_check = wx.CheckBox(left_panel, label="Все листы книги")
+        self.all_sheets_check.SetValue(self.all_sheets)
+        self.all_sheets_check.SetToolTip("Обрабатывать все листы, а не только активный; для каждого листа — своя папка")
+        self.all_sheets_check.Bind(wx.EVT_CHECKBOX, self.update_all_sheets)
+        
+        left_sizer.Add(sources_label, pos=(6, 0), flag=wx.ALIGN_CENTER_VERTICAL)
+        left_sizer.Add(self.all_sheets_check, pos=(6, 1), span=(1, 2))
+        
+        # ZIP archiving
+        archive_label = wx.StaticText(left_panel, label="Архив:")
+        archive_label.SetFont(self.label_font)
+        self.archive_choice = wx.Choice(left_panel, choices=["Нет", "ZIP на папку", "Один ZIP"])
+        self.archive_choice.SetSelection(0)
+        self.archive_choice.SetToolTip("Записывать дипломы сразу в ZIP-архивы вместо отдельных файлов")
+        self.archive_choice.Bind(wx.EVT_CHOICE, self.update_archive)
+        self.archive_store_check = wx.CheckBox(left_panel, label="Без сжатия")
+        self.archive_store_check.SetValue(self.archive_store)
+        self.archive_store_check.SetToolTip("PDF почти не сжимаются: без сжатия архив пишется быстрее")
+        self.archive_store_check.Bind(wx.EVT_CHECKBOX, self.update_archive)
+        
+        left_sizer.Add(archive_label, pos=(7, 0), flag=wx.ALIGN_CENTER_VERTICAL)
+        left_sizer.Add(self.archive_choice, pos=(7, 1))
+        left_sizer.Add(self.archive_store_check, pos=(7, 2))
+        
         left_panel.SetSizer(left_sizer)
         
         # Right panel: Progress, ETA, and log
@@ -430,16 +778,22 @@ class DiplomaGeneratorApp(wx.Frame):
         self.log_queue.put(str(message))
     
     def choose_excel(self, event):
-        with wx.FileDialog(self, "Выберите Excel-файл", wildcard="Excel files (*.xlsx)|*.xlsx",
-                          style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as fileDialog:
+        with wx.FileDialog(self, "Выберите Excel-файлы", wildcard="Excel files (*.xlsx)|*.xlsx",
+                          style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST | wx.FD_MULTIPLE) as fileDialog:
             if fileDialog.ShowModal() == wx.ID_OK:
-                path = fileDialog.GetPath()
-                self.excel_path = path
-                self.excel_path_ctrl.SetValue(path)
-                self.excel_name.SetLabel(os.path.basename(path))
-                self.log_message(f"Загружен Excel: {os.path.basename(path)}")
+                self.excel_paths = fileDialog.GetPaths()
+                self.excel_path = self.excel_paths[0]
+                self.show_excel_paths()
+                self.log_message(f"Загружен Excel: {', '.join(os.path.basename(path) for path in self.excel_paths)}")
                 self.update_buttons()
     
+    def show_excel_paths(self):
+        self.excel_path_ctrl.SetValue("; ".join(self.excel_paths))
+        if len(self.excel_paths) > 1:
+            self.excel_name.SetLabel(f"Файлов: {len(self.excel_paths)}")
+        else:
+            self.excel_name.SetLabel(os.path.basename(self.excel_path))
+    
     def choose_pptx(self, event):
         with wx.FileDialog(self, "Выберите шаблон PPTX", wildcard="PowerPoint files (*.pptx)|*.pptx",
                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as fileDialog:
@@ -512,6 +866,20 @@ class DiplomaGeneratorApp(wx.Frame):
         self.sort_column = self.sort_choice.GetStringSelection()
         self.log_message(f"Сортировка: {'включена' if self.enable_sorting else 'выключена'}, столбец: {self.sort_column}")
     
+    def update_all_sheets(self, event):
+        self.all_sheets = self.all_sheets_check.GetValue()
+        self.log_message(f"Все листы книги: {'да' if self.all_sheets else 'нет'}")
+    
+    def update_archive(self, event):
+        self.archive_mode = {"Нет": "", "ZIP на папку": "per_folder", "Один ZIP": "single"}[self.archive_choice.GetStringSelection()]
+        self.archive_store = self.archive_store_check.GetValue()
+        self.log_message(f"Архив: {self.archive_choice.GetStringSelection()}{', без сжатия' if self.archive_store else ''}")
+    
+    def update_duplicates(self, event):
+        self.duplicate_mode = {"Жёсткая ссылка": "link", "Копия": "copy"}[self.duplicate_choice.GetStringSelection()]
+        self.collision_policy = {"Нумеровать": "number", "Пропустить": "skip", "Перезаписать": "overwrite"}[self.collision_choice.GetStringSelection()]
+        self.log_message(f"Дубликаты: {self.duplicate_choice.GetStringSelection()}, совпадение имён: {self.collision_choice.GetStringSelection()}")
+    
     def open_default_values_window(self):
         dialog = wx.Dialog(self, title="Значения по умолчанию", size=(400, 300))
         panel = wx.Panel(dialog)
@@ -546,8 +914,7 @@ class DiplomaGeneratorApp(wx.Frame):
             return
         
         wb = load_workbook(self.excel_path)
-        ws = wb.active
-        headers = [cell.value or f"Столбец {chr(65+i)}" for i, cell in enumerate(ws[1])]
+        headers = sheet_headers(wb.active)
         
         dialog = wx.Dialog(self, title="Сопоставление плейсхолдеров", size=(400, 400))
         panel = wx.Panel(dialog)
@@ -570,7 +937,8 @@ class DiplomaGeneratorApp(wx.Frame):
         auto_map_btn = wx.Button(panel, label="Автосопоставление")
         auto_map_btn.Bind(wx.EVT_BUTTON, lambda evt: self.auto_map(headers))
         check_btn = wx.Button(panel, label="Проверить данные")
-        check_btn.Bind(wx.EVT_BUTTON, lambda evt: self.check_data(headers, ws))
+        check_btn.SetToolTip("Проверить все выбранные файлы и листы")
+        check_btn.Bind(wx.EVT_BUTTON, lambda evt: self.check_data())
         
         sizer.Add(save_btn, flag=wx.ALIGN_CENTER | wx.ALL, border=5)
         sizer.Add(auto_map_btn, flag=wx.ALIGN_CENTER | wx.ALL, border=5)
@@ -605,13 +973,16 @@ class DiplomaGeneratorApp(wx.Frame):
                     break
         self.log_message("Выполнено автосопоставление")
     
-    def check_data(self, headers, ws):
+    def check_data(self):
         errors = []
-        for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), 2):
-            for placeholder, col_name in self.column_mapping.items():
-                col_idx = headers.index(col_name) if col_name in headers else ord(col_name) - ord('A')
-                if row[col_idx] is None:
-                    errors.append(f"Строка {row_idx}: пустое поле {placeholder} ({col_name})")
+        sources = load_sources(self.excel_paths or [self.excel_path], self.all_sheets)
+        for label, ws, mapping, headers in match_sources(sources, self.column_mapping, self.source_mappings, errors):
+            where = f" ({label})" if label else ""
+            for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), 2):
+                for placeholder, col_name in mapping.items():
+                    col_idx = headers.index(col_name) if col_name in headers else ord(col_name) - ord('A')
+                    if row[col_idx] is None:
+                        errors.append(f"Строка {row_idx}{where}: пустое поле {placeholder} ({col_name})")
         if errors:
             wx.MessageBox(
                 "\n".join(errors[:5]) + (f"\n...и ещё {len(errors)-5} ошибок" if len(errors) > 5 else ""),
@@ -635,10 +1006,13 @@ class DiplomaGeneratorApp(wx.Frame):
     def run_generation(self):
         try:
             success = generate_diplomas(
-                self.excel_path, self.pptx_path, self.output_dir,
+                self.excel_paths or self.excel_path, self.pptx_path, self.output_dir,
                 self.column_mapping, self.error_handling, self.default_values,
                 self.font_settings, self.sort_column, self.enable_sorting,
-                self.log_queue, self.progress_queue, self.eta_queue, self.stop_event
+                self.log_queue, self.progress_queue, self.eta_queue, self.stop_event,
+                self.duplicate_mode, self.collision_policy,
+                self.all_sheets, self.source_mappings,
+                self.archive_mode, self.archive_store
             )
             if success:
                 wx.CallAfter(wx.MessageBox, f"Дипломы сгенерированы в: {self.output_dir}", "Успех", wx.OK | wx.ICON_INFORMATION)
@@ -695,6 +1069,12 @@ class DiplomaGeneratorApp(wx.Frame):
             with open("config.json", "r", encoding="utf-8") as f:
                 config = json.load(f)
                 self.excel_path = config.get("excel_path", "")
+                self.excel_paths = config.get("excel_paths") or ([self.excel_path] if self.excel_path else [])
+                self.excel_path = self.excel_paths[0] if self.excel_paths else ""
+                self.all_sheets = config.get("all_sheets", False)
+                self.source_mappings = config.get("source_mappings", {})
+                self.archive_mode = config.get("archive_mode", "")
+                self.archive_store = config.get("archive_store", False)
                 self.pptx_path = config.get("pptx_path", "")
                 self.output_dir = config.get("output_dir", "")
                 self.column_mapping = config.get("column_mapping", {})
@@ -702,9 +1082,10 @@ class DiplomaGeneratorApp(wx.Frame):
                 self.default_values = config.get("default_values", {})
                 self.sort_column = config.get("sort_column", "")
                 self.enable_sorting = config.get("enable_sorting", True)
+                self.duplicate_mode = config.get("duplicate_mode", "link")
+                self.collision_policy = config.get("collision_policy", "number")
                 if self.excel_path:
-                    self.excel_path_ctrl.SetValue(self.excel_path)
-                    self.excel_name.SetLabel(os.path.basename(self.excel_path))
+                    self.show_excel_paths()
                 if self.pptx_path:
                     self.pptx_path_ctrl.SetValue(self.pptx_path)
                     self.pptx_name.SetLabel(os.path.basename(self.pptx_path))
@@ -714,6 +1095,11 @@ class DiplomaGeneratorApp(wx.Frame):
                     self.output_name.SetLabel(os.path.basename(self.output_dir) or "Папка")
                 self.error_handling_choice.SetStringSelection({"stop": "Остановить", "skip": "Пропустить", "default": "Заполнить по умолчанию"}[self.error_handling])
                 self.sort_check.SetValue(self.enable_sorting)
+                self.all_sheets_check.SetValue(self.all_sheets)
+                self.archive_choice.SetStringSelection({"": "Нет", "per_folder": "ZIP на папку", "single": "Один ZIP"}[self.archive_mode])
+                self.archive_store_check.SetValue(self.archive_store)
+                self.duplicate_choice.SetStringSelection({"link": "Жёсткая ссылка", "copy": "Копия"}[self.duplicate_mode])
+                self.collision_choice.SetStringSelection({"number": "Нумеровать", "skip": "Пропустить", "overwrite": "Перезаписать"}[self.collision_policy])
                 if self.sort_column and self.placeholders:
                     self.sort_choice.SetSelection(self.placeholders.index(self.sort_column) if self.sort_column in self.placeholders else 0)
                 self.update_buttons()
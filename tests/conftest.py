@@ -0,0 +1,15 @@
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# GUI- и Windows-зависимости (wx, PowerPoint COM и т.д.) в тестах не нужны: если их нет, подменяем заглушками
+for name in ["psutil", "wx", "wx.grid", "openpyxl", "pptx", "pptx.util", "pptx.dml", "pptx.dml.color",
+             "pptx.enum", "pptx.enum.text", "comtypes", "comtypes.client", "img2pdf", "PIL", "PIL.Image"]:
+    try:
+        __import__(name)
+    except ImportError:
+        sys.modules[name] = mock.MagicMock()
+        if name == "wx":
+            sys.modules[name].Frame = object
@@ -0,0 +1,405 @@
+import queue
+import threading
+import types
+
+import pytest
+
+import diploma_generator as dg
+
+
+class FakeTimer:
+    def __init__(self, interval, function):
+        self.interval = interval
+        self.function = function
+        self.cancelled = False
+
+    def start(self):
+        pass
+
+    def cancel(self):
+        self.cancelled = True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dg, "time", types.SimpleNamespace(time=lambda: now[0]))
+    monkeypatch.setattr(dg.threading, "Timer", FakeTimer)
+    return now
+
+
+def eta_seconds(eta):
+    minutes, seconds = eta.split(":")
+    return int(minutes) * 60 + int(seconds)
+
+
+def last(q):
+    items = list(q.queue)
+    return items[-1] if items else None
+
+
+# --- ProgressTracker ---
+def test_eta_ignores_powerpoint_warmup(clock):
+    progress_queue, eta_queue = queue.Queue(), queue.Queue()
+    tracker = dg.ProgressTracker(progress_queue, eta_queue)
+    tracker.add(200)
+    for idx in range(200):
+        tracker.advance(idx, "parse")
+    for idx in range(200):
+        clock[0] += 0.1
+        tracker.advance(idx, "render")
+        clock[0] += (20 if idx == 0 else 2) - 0.1
+        tracker.advance(idx, "write")
+        if idx == 0:
+            # По одной записи с разогревом скорость не оцениваем
+            assert eta_queue.empty()
+        elif idx in (1, 5, 20):
+            assert abs(eta_seconds(last(eta_queue)) - 2 * (199 - idx)) <= 10
+
+
+def test_out_of_order_completion(clock):
+    progress_queue, eta_queue = queue.Queue(), queue.Queue()
+    tracker = dg.ProgressTracker(progress_queue, eta_queue, interval=0)
+    tracker.add(4)
+    for idx in [2, 0, 3, 1]:
+        tracker.advance(idx, "parse", "render")
+    for idx in [3, 1, 0, 2]:
+        clock[0] += 1
+        tracker.advance(idx, "write")
+        tracker.advance(idx, "write")
+    assert last(progress_queue) == pytest.approx(100)
+    assert last(eta_queue) == "00:00"
+
+
+def test_discard_removes_row_from_total(clock):
+    progress_queue, eta_queue = queue.Queue(), queue.Queue()
+    tracker = dg.ProgressTracker(progress_queue, eta_queue, interval=0)
+    tracker.add(2)
+    tracker.advance("a", "parse", "render", "write")
+    tracker.discard("b")
+    assert last(progress_queue) == pytest.approx(100)
+
+
+def test_throttled_update_is_flushed(clock):
+    progress_queue, eta_queue = queue.Queue(), queue.Queue()
+    tracker = dg.ProgressTracker(progress_queue, eta_queue)
+    tracker.add(2)
+    tracker.advance(0, "parse", "render", "write")
+    assert last(progress_queue) == pytest.approx(50)
+    clock[0] += 0.1
+    tracker.advance(1, "parse", "render")
+    assert last(progress_queue) == pytest.approx(50)
+    assert tracker.flush_timer.interval == pytest.approx(0.4)
+    clock[0] += 0.4
+    tracker.flush_timer.function()
+    assert last(progress_queue) == pytest.approx(60)
+    assert tracker.flush_timer is None
+
+
+def test_finish_cancels_pending_flush(clock):
+    progress_queue, eta_queue = queue.Queue(), queue.Queue()
+    tracker = dg.ProgressTracker(progress_queue, eta_queue)
+    tracker.add(2)
+    tracker.advance(0, "parse")
+    tracker.advance(1, "parse")
+    timer = tracker.flush_timer
+    tracker.finish()
+    assert timer.cancelled
+    clock[0] += 1
+    timer.function()
+    assert list(progress_queue.queue)[-1] == 100
+    assert last(eta_queue) == "00:00"
+
+
+def test_flush_skipped_after_stop(clock):
+    progress_queue, eta_queue = queue.Queue(), queue.Queue()
+    stop_event = threading.Event()
+    tracker = dg.ProgressTracker(progress_queue, eta_queue, stop_event)
+    tracker.add(2)
+    tracker.advance(0, "parse")
+    tracker.advance(1, "parse")
+    sent = progress_queue.qsize()
+    stop_event.set()
+    clock[0] += 1
+    tracker.flush_timer.function()
+    assert progress_queue.qsize() == sent
+
+
+# --- Generation loop: duplicates and file name collisions ---
+class FakeSheet:
+    def __init__(self, title, headers, rows):
+        self.title = title
+        self.headers = headers
+        self.rows = rows
+        self.max_row = len(rows) + 1 if headers else 0
+
+    def __getitem__(self, row):
+        return [types.SimpleNamespace(value=header) for header in self.headers]
+
+    def iter_rows(self, min_row, values_only):
+        return iter(self.rows)
+
+
+class FakePresentation:
+    def __init__(self, stream):
+        self.shape = types.SimpleNamespace(values=[])
+        self.slides = [types.SimpleNamespace(shapes=[self.shape])]
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("|".join(self.shape.values))
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    books = {}
+    renders = []
+
+    def fake_pptx_to_pdf(input_pptx, output_pdf, stop_event, powerpoint=None):
+        with open(input_pptx, encoding="utf-8") as f:
+            content = f.read()
+        renders.append(content)
+        with (output_pdf() if callable(output_pdf) else open(output_pdf, "wb")) as f:
+            f.write(content.encode("utf-8"))
+        return True
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(dg, "load_workbook", lambda path: books[path])
+    monkeypatch.setattr(dg, "Presentation", FakePresentation)
+    monkeypatch.setattr(dg, "replace_text", lambda shape, placeholder, value, font_settings: shape.values.append(f"{placeholder}={value}"))
+    monkeypatch.setattr(dg, "pptx_to_pdf", fake_pptx_to_pdf)
+    monkeypatch.setattr(dg, "open_powerpoint", lambda: object())
+    monkeypatch.setattr(dg, "close_powerpoint", lambda powerpoint: None)
+    (tmp_path / "template.pptx").write_bytes(b"template")
+
+    def run(workbooks, mapping=None, sort_column="", **kwargs):
+        for path, sheets in workbooks.items():
+            books[path] = types.SimpleNamespace(worksheets=sheets, active=sheets[0])
+        log_queue = queue.Queue()
+        success = dg.generate_diplomas(
+            list(workbooks), str(tmp_path / "template.pptx"), str(tmp_path / "out"),
+            mapping or {"NAME": "ФИО", "LEARN": "Курс"}, "stop", {}, {"use_custom": False},
+            sort_column, bool(sort_column), log_queue, queue.Queue(), queue.Queue(), threading.Event(), **kwargs
+        )
+        return success, list(log_queue.queue)
+
+    run.renders = renders
+    run.out = tmp_path / "out"
+    return run
+
+
+def sheet(title, *rows):
+    return FakeSheet(title, ["ФИО", "Курс"], list(rows))
+
+
+def test_numbered_path():
+    used = {dg.os.path.normcase(path) for path in ["out/Иванов.pdf", "out/Иванов (2).pdf"]}
+    assert dg.numbered_path("out/Иванов.pdf", used) == "out/Иванов (3).pdf"
+
+
+def test_identical_records_rendered_once_and_hardlinked(generator):
+    success, log = generator({"book.xlsx": [sheet("Лист1", ("Иванов", "Python"), ("Иванов", "Python"))]})
+    assert success
+    assert len(generator.renders) == 1
+    first, second = generator.out / "Иванов.pdf", generator.out / "Иванов (2).pdf"
+    assert first.stat().st_ino == second.stat().st_ino
+
+
+def test_duplicate_copy_mode(generator):
+    generator({"book.xlsx": [sheet("Лист1", ("Иванов", "Python"), ("Иванов", "Python"))]}, duplicate_mode="copy")
+    first, second = generator.out / "Иванов.pdf", generator.out / "Иванов (2).pdf"
+    assert first.stat().st_ino != second.stat().st_ino
+    assert first.read_bytes() == second.read_bytes()
+
+
+def test_namesakes_are_numbered_not_overwritten(generator):
+    generator({"book.xlsx": [sheet("Лист1", ("Иванов", "Python"), ("Иванов", "Java"))]})
+    assert len(generator.renders) == 2
+    assert b"Python" in (generator.out / "Иванов.pdf").read_bytes()
+    assert b"Java" in (generator.out / "Иванов (2).pdf").read_bytes()
+
+
+def test_collision_skip(generator):
+    success, log = generator({"book.xlsx": [sheet("Лист1", ("Иванов", "Python"), ("Иванов", "Java"))]}, collision_policy="skip")
+    assert success
+    assert len(generator.renders) == 1
+    assert sorted(path.name for path in generator.out.iterdir()) == ["Иванов.pdf"]
+    assert any("уже создан" in message for message in log)
+
+
+def test_overwrite_invalidates_rendered_source(generator):
+    # Иванов/Java перезаписывает файл Иванов/Python, поэтому повтор Python нужно рендерить заново
+    generator({"book.xlsx": [sheet("Лист1", ("Иванов", "Python"), ("Иванов", "Java"), ("Иванов", "Python"))]},
+              collision_policy="overwrite")
+    assert len(generator.renders) == 3
+    assert b"Python" in (generator.out / "Иванов.pdf").read_bytes()
+
+
+def test_overwrite_by_hardlink_invalidates_rendered_source(generator):
+    generator({"book.xlsx": [
+        sheet("Группа1", ("Иванов", "Python")),
+        sheet("Группа2", ("Иванов", "Java"), ("Иванов", "Python"), ("Иванов", "Java")),
+    ]}, collision_policy="overwrite", all_sheets=True)
+    assert len(generator.renders) == 3
+    # Повторная запись Java не должна пройти сквозь жёсткую ссылку в файл первой группы
+    assert b"Python" in (generator.out / "Группа1" / "Иванов.pdf").read_bytes()
+    assert b"Java" in (generator.out / "Группа2" / "Иванов.pdf").read_bytes()
+
+
+def test_failed_run_stops_tracker(generator, monkeypatch):
+    trackers = []
+
+    class RecordingTracker(dg.ProgressTracker):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            trackers.append(self)
+
+    def failing_pptx_to_pdf(input_pptx, output_pdf, stop_event, powerpoint=None):
+        raise Exception("Ошибка конвертации: PowerPoint недоступен")
+
+    monkeypatch.setattr(dg, "ProgressTracker", RecordingTracker)
+    monkeypatch.setattr(dg, "pptx_to_pdf", failing_pptx_to_pdf)
+    success, log = generator({"book.xlsx": [sheet("Лист1", ("Иванов", "Python"), ("Петров", "Java"))]})
+    assert not success
+    tracker, = trackers
+    # Отложенное обновление отменено, и после ошибки GUI не получит ни запоздалый прогресс, ни 100%
+    assert tracker.finished
+    assert tracker.flush_timer is None
+    assert 100 not in list(tracker.progress_queue.queue)
+
+
+# --- Batch sources ---
+def test_empty_and_unmatched_sheets_are_skipped(generator):
+    success, log = generator({"book.xlsx": [
+        sheet("Лист1", ("Иванов", "Python")),
+        FakeSheet("Пустой", [], []),
+        FakeSheet("Справочник", ["Курс", "Часы"], [("Python", 72)]),
+    ]}, all_sheets=True)
+    assert success
+    assert len(generator.renders) == 1
+    assert any("Пустой" in message and "Справочник" in message for message in log)
+
+
+def test_no_matching_sheets_fails(generator):
+    success, log = generator({"book.xlsx": [FakeSheet("Справочник", ["Курс"], [("Python",)])]})
+    assert not success
+    assert len(generator.renders) == 0
+
+
+def test_source_mapping_key_does_not_depend_on_selection(generator):
+    mappings = {"group2 - Лист1": {"NAME": "Фамилия"}}
+    group2 = FakeSheet("Лист1", ["Фамилия"], [("Петров",)])
+    generator({"group2.xlsx": [group2]}, mapping={"NAME": "ФИО"}, source_mappings=mappings)
+    generator({"group1.xlsx": [sheet("Лист1", ("Иванов", "Python"))], "group2.xlsx": [group2]},
+              mapping={"NAME": "ФИО"}, source_mappings=mappings)
+    assert (generator.out / "Петров.pdf").exists()
+    assert (generator.out / "group2" / "Петров.pdf").exists()
+
+
+# --- ZIP output ---
+def zip_contents(path):
+    with dg.zipfile.ZipFile(path) as archive:
+        return {info.filename: (info.compress_type, archive.read(info.filename)) for info in archive.infolist()}
+
+
+def test_zip_output_per_folder(tmp_path):
+    output = dg.ZipOutput(str(tmp_path), per_folder=True, store_only=True)
+    with output.open(str(tmp_path / "Python" / "Иванов.pdf")) as f:
+        f.write(b"ivanov")
+    with output.open(str(tmp_path / "Петров.pdf")) as f:
+        f.write(b"petrov")
+    output.duplicate(str(tmp_path / "Python" / "Иванов.pdf"), str(tmp_path / "Java" / "Иванов.pdf"))
+    output.close()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["Java.zip", "Python.zip", "Дипломы.zip"]
+    assert zip_contents(tmp_path / "Python.zip") == {"Иванов.pdf": (dg.zipfile.ZIP_STORED, b"ivanov")}
+    assert zip_contents(tmp_path / "Java.zip") == {"Иванов.pdf": (dg.zipfile.ZIP_STORED, b"ivanov")}
+    assert zip_contents(tmp_path / "Дипломы.zip") == {"Петров.pdf": (dg.zipfile.ZIP_STORED, b"petrov")}
+
+
+def test_zip_output_single_archive(tmp_path):
+    output = dg.ZipOutput(str(tmp_path), per_folder=False, store_only=False)
+    with output.open(str(tmp_path / "Группа" / "Python" / "Иванов.pdf")) as f:
+        f.write(b"ivanov")
+    output.close()
+    assert zip_contents(tmp_path / "Дипломы.zip") == {"Группа/Python/Иванов.pdf": (dg.zipfile.ZIP_DEFLATED, b"ivanov")}
+
+
+def test_generation_into_zip_leaves_no_loose_pdfs(generator):
+    success, log = generator({"book.xlsx": [sheet("Лист1", ("Иванов", "Python"), ("Иванов", "Python"), ("Петров", "Java"))]},
+                             sort_column="LEARN", archive_mode="per_folder", collision_policy="overwrite")
+    assert success
+    assert len(generator.renders) == 2
+    assert sorted(path.name for path in generator.out.iterdir()) == ["Java.zip", "Python.zip"]
+    # Перезапись в ZIP невозможна, поэтому дубликат получает номер
+    assert sorted(zip_contents(generator.out / "Python.zip")) == ["Иванов (2).pdf", "Иванов.pdf"]
+
+
+class FakePowerPoint:
+    def __init__(self):
+        self.Presentations = types.SimpleNamespace(Open=self.open)
+
+    def open(self, path):
+        def export(jpg_path, *args):
+            with open(jpg_path, "wb") as f:
+                f.write(b"jpg")
+        return types.SimpleNamespace(Slides={1: types.SimpleNamespace(Export=export)}, Close=lambda: None)
+
+
+def fake_img2pdf(convert):
+    return types.SimpleNamespace(mm_to_pt=lambda mm: mm, get_layout_fun=lambda size: None, convert=convert)
+
+
+def test_pptx_to_pdf_writes_converted_pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(dg, "img2pdf", fake_img2pdf(lambda jpg, layout_fun: b"%PDF"))
+    output = dg.ZipOutput(str(tmp_path), per_folder=False, store_only=True)
+    assert dg.pptx_to_pdf(str(tmp_path / "temp.pptx"), lambda: output.open(str(tmp_path / "Иванов.pdf")),
+                          threading.Event(), FakePowerPoint())
+    output.close()
+    assert zip_contents(tmp_path / "Дипломы.zip") == {"Иванов.pdf": (dg.zipfile.ZIP_STORED, b"%PDF")}
+
+
+@pytest.mark.parametrize("archive", [True, False])
+def test_failed_conversion_leaves_no_output(tmp_path, monkeypatch, archive):
+    def convert(jpg, layout_fun):
+        raise ValueError("битый JPG")
+
+    monkeypatch.setattr(dg, "img2pdf", fake_img2pdf(convert))
+    pdf_path = tmp_path / "Иванов.pdf"
+    if archive:
+        output = dg.ZipOutput(str(tmp_path), per_folder=False, store_only=True)
+    else:
+        output = dg.FolderOutput(str(tmp_path), "link")
+        pdf_path.write_bytes(b"previous run")
+    with pytest.raises(Exception, match="Ошибка конвертации"):
+        dg.pptx_to_pdf(str(tmp_path / "temp.pptx"), lambda: output.open(str(pdf_path)), threading.Event(), FakePowerPoint())
+    output.close()
+    if archive:
+        assert not (tmp_path / "Дипломы.zip").exists()
+    else:
+        assert pdf_path.read_bytes() == b"previous run"
+
+
+def test_same_named_workbooks_stay_separate(generator, monkeypatch):
+    trackers = []
+
+    class RecordingTracker(dg.ProgressTracker):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            trackers.append(self)
+
+    monkeypatch.setattr(dg, "ProgressTracker", RecordingTracker)
+    success, log = generator({
+        "g1/список.xlsx": [sheet("Лист1", ("Иванов", "Python"))],
+        "g2/список.xlsx": [FakeSheet("Лист1", ["Фамилия", "Курс"], [("Петров", "Java")])],
+    }, source_mappings={"g2 - список - Лист1": {"NAME": "Фамилия", "LEARN": "Курс"}})
+    assert success
+    assert (generator.out / "g1 - список" / "Иванов.pdf").exists()
+    assert (generator.out / "g2 - список" / "Петров.pdf").exists()
+    tracker, = trackers
+    assert tracker.total == 2
+    assert tracker.done_work == pytest.approx(2)
+
+
+def test_book_names():
+    assert dg.book_names(["a/список.xlsx", "b/список.xlsx", "b/список.xlsx", "b/другой.xlsx"]) == [
+        "a - список", "b - список", "b - список (2)", "другой"]